@@ -1,12 +1,11 @@
 import streamlit as st 
 import pandas as pd
 import folium
-import json
 from streamlit_folium import folium_static
-import numpy as np
 import plotly.express as px
 from folium.plugins import HeatMap, MarkerCluster, Search
 from branca.colormap import LinearColormap
+from coverage_data import load_data, find_nearby_stations
 
 # Page configuration
 
@@ -19,6 +18,9 @@ st.set_page_config(
 if 'nearby_stations' not in st.session_state:
     st.session_state.nearby_stations = None
 
+if 'last_location' not in st.session_state:
+    st.session_state.last_location = None
+
 # Custom style
 st.markdown("""
     <style>
@@ -33,66 +35,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Load data
-@st.cache_data
-def load_data():
-    try:
-        df = pd.read_csv('resources/MOBILE_SERVICE_COVERAGE_BY_COMPANY.csv', 
-                        sep=';', 
-                        encoding='latin-1')
-        
-        # Calculate available technologies
-        df['technologies'] = df.apply(lambda x: [tech for tech, val in 
-            zip(['2G', '3G', '4G', '5G'], [x['2G'], x['3G'], x['4G'], x['5G']]) 
-            if val == 'YES'], axis=1)
-        
-        return df
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        return None
-
-# Improved function to find nearby stations
-def find_nearby_stations(df, lat, lon, radius_km=5, operator_filter=None):
-    try:
-        # Calculate distances using numpy
-        df['distance'] = np.sqrt(
-            (df['LATITUD'] - lat)**2 + 
-            (df['LONGITUD'] - lon)**2
-        ) * 111  # Approximate conversion to kilometers
-        
-        # Apply filters
-        mask = df['distance'] <= radius_km
-        if operator_filter:
-            mask &= df['EMPRESA_OPERADORA'] == operator_filter
-            
-        nearby_df = df[mask].copy()
-        
-        # Convert to list of dictionaries
-        nearby = []
-        for _, row in nearby_df.iterrows():
-            techs = [tech for tech, val in 
-                    zip(['2G', '3G', '4G', '5G'], 
-                        [row['2G'], row['3G'], row['4G'], row['5G']]) 
-                    if val == 1]
-            
-            nearby.append({
-                'distance': round(row['distance'], 2),
-                'CENTRO_POBLADO': row['CENTRO_POBLADO'],
-                'operator': row['EMPRESA_OPERADORA'],
-                'department': row['DEPARTAMENTO'],
-                'province': row['PROVINCIA'],
-                'district': row['DISTRITO'],
-                'lat': row['LATITUD'],
-                'lon': row['LONGITUD'],
-                'technologies': techs,
-                'speed': 'More than 1Mbps' if row['MÁS_DE_1_MBPS'] == 1 else 'Up to 1Mbps'
-            })
-        
-        return nearby
-    except Exception as e:
-        st.error(f"Error in search: {str(e)}")
-        return []
-
 def create_enhanced_map(lat, lon, nearby_stations):
     try:
         m = folium.Map(location=[lat, lon], zoom_start=12)
@@ -225,10 +167,14 @@ def main():
             # Search for nearby stations
             nearby = find_nearby_stations(df, lat, lon, radius, operator_filter)
             print(nearby)
-            if len(nearby) != 0:
-                with open('resources/nearby.json', 'w') as file:
-                    json.dump(nearby, file, indent=4)
-                    print("JSON saved successfully.")
+
+            # Remember the location so the chatbot can look up coverage for it
+            st.session_state.last_location = {
+                'lat': lat,
+                'lon': lon,
+                'radius': radius,
+                'operator_filter': operator_filter
+            }
             
             if nearby:
                 st.success(f"{len(nearby)} nearby stations found")
@@ -0,0 +1,85 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+# Load data
+@st.cache_data
+def load_data():
+    try:
+        df = pd.read_csv('resources/MOBILE_SERVICE_COVERAGE_BY_COMPANY.csv',
+                        sep=';',
+                        encoding='latin-1')
+
+        # Calculate available technologies
+        df['technologies'] = df.apply(lambda x: [tech for tech, val in
+            zip(['2G', '3G', '4G', '5G'], [x['2G'], x['3G'], x['4G'], x['5G']])
+            if val == 'YES'], axis=1)
+
+        return df
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+        return None
+
+# One frame shared by every session. load_data() hands out a fresh copy on
+# each call, so callers that only read the frame should use this instead.
+@st.cache_resource
+def load_shared_data():
+    return load_data()
+
+# Search nearby stations, raising on failure so callers outside the
+# script thread can report the error themselves
+def search_stations(df, lat, lon, radius_km=5, operator_filter=None):
+    # Calculate distances using numpy
+    distance = np.sqrt(
+        (df['LATITUD'] - lat)**2 +
+        (df['LONGITUD'] - lon)**2
+    ) * 111  # Approximate conversion to kilometers
+
+    # Apply filters
+    mask = distance <= radius_km
+    if operator_filter:
+        mask &= df['EMPRESA_OPERADORA'] == operator_filter
+
+    nearby_df = df[mask]
+
+    # Convert to list of dictionaries, column by column instead of iterrows
+    techs = [
+        [tech for tech, val in zip(['2G', '3G', '4G', '5G'], vals) if val == 1]
+        for vals in zip(nearby_df['2G'], nearby_df['3G'], nearby_df['4G'], nearby_df['5G'])
+    ]
+
+    return [
+        {
+            'distance': dist,
+            'CENTRO_POBLADO': centro_poblado,
+            'operator': operator,
+            'department': department,
+            'province': province,
+            'district': district,
+            'lat': station_lat,
+            'lon': station_lon,
+            'technologies': station_techs,
+            'speed': 'More than 1Mbps' if speed == 1 else 'Up to 1Mbps'
+        }
+        for dist, centro_poblado, operator, department, province, district,
+            station_lat, station_lon, station_techs, speed in zip(
+            distance[mask].round(2).tolist(),
+            nearby_df['CENTRO_POBLADO'].tolist(),
+            nearby_df['EMPRESA_OPERADORA'].tolist(),
+            nearby_df['DEPARTAMENTO'].tolist(),
+            nearby_df['PROVINCIA'].tolist(),
+            nearby_df['DISTRITO'].tolist(),
+            nearby_df['LATITUD'].tolist(),
+            nearby_df['LONGITUD'].tolist(),
+            techs,
+            nearby_df['MÁS_DE_1_MBPS'].tolist()
+        )
+    ]
+
+# Improved function to find nearby stations
+def find_nearby_stations(df, lat, lon, radius_km=5, operator_filter=None):
+    try:
+        return search_stations(df, lat, lon, radius_km, operator_filter)
+    except Exception as e:
+        st.error(f"Error in search: {str(e)}")
+        return []
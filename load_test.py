@@ -0,0 +1,509 @@
+"""
+LlamaRural - Load testing harness
+
+Starts the app with `streamlit run` and drives N concurrent simulated
+sessions through the Coverage Analysis and Optimus Llama Chatbot pages with
+a headless websocket client, the same way a browser does. The AIML API is
+replaced by a local stub LLM server so the numbers reflect the app itself.
+
+Reports rerun latency percentiles, throughput, server memory growth and any
+stale or cross-session data detected along the way.
+
+Usage:
+    python load_test.py --sessions 20 --actions 10
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import threading
+import subprocess
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join('resources', 'MOBILE_SERVICE_COVERAGE_BY_COMPANY.csv')
+
+# Page url paths end with these names
+COVERAGE_PAGE = 'Coverage_Analysis'
+CHATBOT_PAGE = 'Optimus_Llama_Chatbot'
+
+# Chat turns the simulated users pick from
+GENERAL_PROMPTS = [
+    "What is the capital of Peru?",
+    "Give me some first aid tips for a minor burn.",
+    "Explain the difference between 3G and 4G.",
+    "Write a short lesson plan about the water cycle.",
+]
+CONNECTIVITY_PROMPTS = [
+    "I have no signal at home, which operator should I use?",
+    "My internet connection keeps dropping, what can I do?",
+    "Where is the nearest place with 4G coverage?",
+]
+
+SESSION_TAG = re.compile(r'^\[(session-\d+)\]')
+
+
+# Stub LLM server
+class StubLLMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length))
+        messages = payload.get('messages', [])
+
+        time.sleep(self.server.latency)
+        content = self.server.reply(messages)
+
+        body = json.dumps({
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the report readable
+        pass
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), StubLLMHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        # Session tag -> chat histories received for final completions
+        self.histories = {}
+
+    def handle_error(self, request, client_address):
+        # The chatbot cancels draft answers it does not need, closing the
+        # connection before the stub replies. Keep the report readable.
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reply(self, messages):
+        with self.lock:
+            self.requests += 1
+
+        instruction = messages[-1]['content'] if messages else ''
+        user_messages = [m['content'] for m in messages if m['role'] == 'user']
+        last_user = user_messages[-1] if user_messages else ''
+
+        # Model routing prompt
+        if "'Llama-3.2-3B' or 'Meta-Llama-3.1-405B'" in instruction:
+            return 'Meta-Llama-3.1-405B' if len(last_user) > 60 else 'Llama-3.2-3B'
+
+        # Location classification prompt
+        if 'requires location data' in instruction:
+            return 'Yes' if any(p in last_user for p in CONNECTIVITY_PROMPTS) else 'No'
+
+        # Final completion: keep the history so sessions can check it
+        match = SESSION_TAG.match(last_user)
+        if match:
+            with self.lock:
+                self.histories.setdefault(match.group(1), []).append(messages)
+        return f"Stub answer to: {last_user}"
+
+    def pop_histories(self, tag):
+        with self.lock:
+            return self.histories.pop(tag, [])
+
+
+# Helpers
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_rss_mb(pid):
+    # Resident memory of the app server, read from /proc where available
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_app(port, stub_url):
+    env = dict(os.environ, AIML_API_KEY='load-test', AIML_BASE_URL=stub_url)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', 'Home.py',
+         '--server.headless', 'true',
+         '--server.port', str(port),
+         '--browser.gatherUsageStats', 'false'],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    # Wait for the health endpoint
+    for _ in range(120):
+        if process.poll() is not None:
+            sys.exit("Streamlit server exited during startup")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    sys.exit("Streamlit server did not become healthy")
+
+
+def count_nearby_stations(df, lat, lon, radius_km):
+    # Same distance formula as the coverage page, on a private copy
+    distance = np.sqrt(
+        (df['LATITUD'] - lat)**2 +
+        (df['LONGITUD'] - lon)**2
+    ) * 111
+    return int((distance <= radius_km).sum())
+
+
+def parse_location_data(messages):
+    # Stations attached by the chatbot page for the current turn
+    last_user = max(i for i, m in enumerate(messages) if m['role'] == 'user')
+    for message in messages[last_user + 1:]:
+        if message['role'] == 'system' and message['content'].startswith('Location data:'):
+            try:
+                return json.loads(message['content'].split('\n', 1)[1])
+            except (ValueError, IndexError):
+                return []
+    return None
+
+
+class Metrics:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = []
+        self.corruption = []
+
+    def record(self, name, seconds):
+        self.latencies.setdefault(name, []).append(seconds)
+
+    def error(self, tag, message):
+        self.errors.append(f"{tag}: {message}")
+
+    def corrupted(self, tag, message):
+        self.corruption.append(f"{tag}: {message}")
+
+
+# Headless Streamlit client
+class StreamlitClient:
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.websocket = None
+        self.pages = {}
+        self.page = None
+        # Output of the last rerun
+        self.widgets = {}
+        self.alerts = []
+        self.exceptions = []
+
+    async def connect(self):
+        self.websocket = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None)
+
+    async def close(self):
+        await self.websocket.close()
+
+    async def rerun(self, page=None, widget_states=()):
+        # The browser always reruns the page it is on
+        if page is not None:
+            self.page = page
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        if self.page is not None:
+            msg.rerun_script.page_script_hash = self.pages[self.page]
+        msg.rerun_script.widget_states.widgets.extend(widget_states)
+        await self.websocket.send(msg.SerializeToString())
+
+        self.widgets, self.alerts, self.exceptions = {}, [], []
+        await asyncio.wait_for(self.read_until_finished(), self.timeout)
+
+    async def read_until_finished(self):
+        # Every script run starts with new_session, skip leftovers of earlier runs
+        started = False
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self.websocket.recv())
+            kind = msg.WhichOneof('type')
+
+            if kind == 'new_session':
+                started = True
+                self.widgets, self.alerts, self.exceptions = {}, [], []
+            elif not started:
+                continue
+            elif kind == 'navigation':
+                for page in msg.navigation.app_pages:
+                    for name in (COVERAGE_PAGE, CHATBOT_PAGE):
+                        if page.url_pathname.endswith(name):
+                            self.pages[name] = page.page_script_hash
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                self.collect(msg.delta.new_element)
+            elif kind == 'script_finished':
+                return msg.script_finished
+
+    def collect(self, element):
+        kind = element.WhichOneof('type')
+        if kind == 'alert':
+            self.alerts.append(element.alert.body)
+        elif kind == 'exception':
+            self.exceptions.append(f"{element.exception.type}: {element.exception.message}")
+        elif kind == 'chat_input':
+            self.widgets[kind] = element.chat_input.id
+        elif kind in ('slider', 'number_input', 'button'):
+            widget = getattr(element, kind)
+            self.widgets[widget.label] = widget.id
+
+
+# Simulated session
+class SimulatedSession:
+    def __init__(self, index, df, server, metrics, args):
+        self.tag = f"session-{index}"
+        self.df = df
+        self.server = server
+        self.metrics = metrics
+        self.args = args
+        self.random = random.Random(args.seed + index)
+        self.client = StreamlitClient(f"ws://127.0.0.1:{args.port}/_stcore/stream", args.timeout)
+        self.last_search = None
+
+    async def timed_rerun(self, name, page=None, widget_states=()):
+        start = time.perf_counter()
+        await self.client.rerun(page, widget_states)
+        self.metrics.record(name, time.perf_counter() - start)
+        for exception in self.client.exceptions:
+            self.metrics.error(self.tag, f"{name}: {exception}")
+        # A crashed page has no widgets left, reload it on the next action
+        if self.client.exceptions:
+            self.client.page = None
+
+    async def open_page(self, page):
+        # Switching pages is a rerun of the new page without widget changes
+        if self.client.page != page:
+            await self.timed_rerun('coverage load' if page == COVERAGE_PAGE else 'chat load', page)
+        return self.client.page == page
+
+    async def coverage_search(self):
+        if not await self.open_page(COVERAGE_PAGE):
+            return
+
+        station = self.df.iloc[self.random.randrange(len(self.df))]
+        lat = float(station['LATITUD']) + self.random.uniform(-0.05, 0.05)
+        lon = float(station['LONGITUD']) + self.random.uniform(-0.05, 0.05)
+        radius = self.random.randint(1, 20)
+
+        widgets = self.client.widgets
+        states = [
+            WidgetState(id=widgets['Search Radius (km)']),
+            WidgetState(id=widgets['Latitude'], double_value=lat),
+            WidgetState(id=widgets['Longitude'], double_value=lon),
+            WidgetState(id=widgets['Analyze Coverage'], trigger_value=True)
+        ]
+        states[0].double_array_value.data.append(radius)
+        await self.timed_rerun('coverage search', widget_states=states)
+
+        found = None
+        for alert in self.client.alerts:
+            match = re.match(r'(\d+) nearby stations found', alert)
+            if match:
+                found = int(match.group(1))
+            elif alert.startswith('No stations found'):
+                found = 0
+        if found is None:
+            self.metrics.error(self.tag, "coverage search rendered no result")
+            return
+
+        expected = count_nearby_stations(self.df, lat, lon, radius)
+        if found != expected:
+            self.metrics.corrupted(
+                self.tag,
+                f"search at ({lat:.4f}, {lon:.4f}) r={radius}km returned {found} stations, expected {expected}"
+            )
+        self.last_search = (lat, lon, radius) if found else None
+
+    async def chat_turn(self):
+        if not await self.open_page(CHATBOT_PAGE):
+            return
+
+        if self.random.random() < 0.5:
+            text = self.random.choice(CONNECTIVITY_PROMPTS)
+        else:
+            text = self.random.choice(GENERAL_PROMPTS)
+
+        state = WidgetState(id=self.client.widgets['chat_input'])
+        state.chat_input_value.data = f"[{self.tag}] {text}"
+        await self.timed_rerun('chat turn', widget_states=[state])
+
+        for messages in self.server.pop_histories(self.tag):
+            self.check_history(messages)
+
+    def check_history(self, messages):
+        # Every user message must belong to this session
+        for message in messages:
+            if message['role'] != 'user':
+                continue
+            match = SESSION_TAG.match(message['content'])
+            if not match or match.group(1) != self.tag:
+                self.metrics.corrupted(self.tag, f"foreign chat message in history: {message['content']!r}")
+
+        # Attached stations must come from this session's last search
+        stations = parse_location_data(messages)
+        if stations is None:
+            return
+        if self.last_search is None:
+            self.metrics.corrupted(self.tag, f"chat attached {len(stations)} stations this session never found")
+            return
+        lat, lon, radius = self.last_search
+        foreign = [
+            s for s in stations
+            if np.sqrt((s['lat'] - lat)**2 + (s['lon'] - lon)**2) * 111 > radius + 0.01
+        ]
+        if foreign:
+            self.metrics.corrupted(
+                self.tag,
+                f"chat attached {len(foreign)}/{len(stations)} stations outside the last search radius"
+            )
+
+    async def run(self):
+        try:
+            await self.client.connect()
+            await self.timed_rerun('home load')
+        except Exception as e:
+            self.metrics.error(self.tag, f"{type(e).__name__}: {e}")
+            return
+
+        for _ in range(self.args.actions):
+            action = self.coverage_search if self.random.random() < self.args.search_ratio else self.chat_turn
+            try:
+                await action()
+            except Exception as e:
+                self.metrics.error(self.tag, f"{type(e).__name__}: {e}")
+                # Reload the page on the next action, like a browser refresh
+                self.client.page = None
+            if self.args.think_time:
+                await asyncio.sleep(self.random.uniform(0, 2 * self.args.think_time))
+
+        await self.client.close()
+
+
+async def run_sessions(sessions, pid):
+    # Sample server memory while the sessions run
+    peak = 0
+    tasks = [asyncio.create_task(session.run()) for session in sessions]
+    while not all(task.done() for task in tasks):
+        peak = max(peak, process_rss_mb(pid) or 0)
+        await asyncio.sleep(0.1)
+    return peak
+
+
+# Report
+def print_report(metrics, server, args, elapsed, rss_start, rss_peak, rss_end):
+    print(f"\nSessions: {args.sessions} | Actions per session: {args.actions} | "
+          f"Stub latency: {args.llm_latency * 1000:.0f}ms")
+    print(f"Wall time: {elapsed:.2f}s | LLM requests served: {server.requests}\n")
+
+    print(f"{'Rerun':<18}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    total = 0
+    for name, values in sorted(metrics.latencies.items()):
+        ms = np.array(values) * 1000
+        total += len(values)
+        print(f"{name:<18}{len(values):>7}"
+              f"{np.percentile(ms, 50):>10.1f}{np.percentile(ms, 90):>10.1f}"
+              f"{np.percentile(ms, 99):>10.1f}{ms.max():>10.1f}")
+    print(f"\nThroughput: {total / elapsed:.2f} reruns/s")
+    if rss_start is not None:
+        print(f"Server memory (RSS): start {rss_start:.1f}MB | peak {rss_peak:.1f}MB | "
+              f"end {rss_end:.1f}MB | growth {rss_end - rss_start:+.1f}MB")
+
+    print(f"\nErrors: {len(metrics.errors)}")
+    for error in metrics.errors[:20]:
+        print(f"  - {error}")
+    print(f"Stale or cross-session data: {len(metrics.corruption)}")
+    for issue in metrics.corruption[:20]:
+        print(f"  - {issue}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the LlamaRural Streamlit pages")
+    parser.add_argument('--sessions', type=int, default=10, help="Concurrent simulated sessions")
+    parser.add_argument('--actions', type=int, default=10, help="Searches and chat turns per session")
+    parser.add_argument('--search-ratio', type=float, default=0.4, help="Share of actions that are coverage searches")
+    parser.add_argument('--llm-latency', type=float, default=0.2, help="Stub LLM latency per request (s)")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Mean pause between actions (s)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Timeout per rerun (s)")
+    parser.add_argument('--port', type=int, default=None, help="Port for the Streamlit server")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # The pages use paths relative to the repository root
+    os.chdir(ROOT_DIR)
+    if not os.path.exists(DATA_PATH):
+        sys.exit(f"Dataset not found: {DATA_PATH}")
+    df = pd.read_csv(DATA_PATH, sep=';', encoding='latin-1')
+    args.port = args.port or free_port()
+
+    server = StubLLMServer(args.llm_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    app = start_app(args.port, server.base_url)
+    metrics = Metrics()
+    sessions = [SimulatedSession(i, df, server, metrics, args) for i in range(args.sessions)]
+
+    try:
+        rss_start = process_rss_mb(app.pid)
+        start = time.perf_counter()
+        rss_peak = asyncio.run(run_sessions(sessions, app.pid))
+        elapsed = time.perf_counter() - start
+        rss_end = process_rss_mb(app.pid)
+    finally:
+        app.terminate()
+        app.wait()
+        server.shutdown()
+
+    if rss_start is not None:
+        rss_peak = max(rss_peak, rss_start, rss_end)
+    print_report(metrics, server, args, elapsed, rss_start, rss_peak, rss_end)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 import os
 import io
 import json
+import asyncio
 import streamlit as st 
 import pandas as pd
-from openai import OpenAI
+from openai import AsyncOpenAI
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from coverage_data import load_shared_data, search_stations
 
 load_dotenv()
 
@@ -15,19 +18,22 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+SMALL_MODEL = "meta-llama/Llama-3.2-3B-Instruct-Turbo"
+LARGE_MODEL = "meta-llama/Meta-Llama-3.1-405B-Instruct-Turbo"
+
 # Initialize OpenAI client
-client = OpenAI(
+client = AsyncOpenAI(
     api_key=os.environ['AIML_API_KEY'],
-    base_url="https://api.aimlapi.com"
+    base_url=os.environ.get('AIML_BASE_URL', "https://api.aimlapi.com")
 )
 
 if "chat_messages" not in st.session_state:
     st.session_state.chat_messages = [{"role": 'system', "content": 'You are a helpful assistant'}]
 
-def analyze_chat_history(messages):
+async def analyze_chat_history(messages):
     # Basic analysis to determine which model to use
-    response = client.chat.completions.create(
-        model="meta-llama/Llama-3.2-3B-Instruct-Turbo",
+    response = await client.chat.completions.create(
+        model=SMALL_MODEL,
         messages=[
             *messages,
             {
@@ -40,14 +46,14 @@ def analyze_chat_history(messages):
     model_choice = response.choices[0].message.content
 
     if "405b" in model_choice.lower():
-        return "meta-llama/Meta-Llama-3.1-405B-Instruct-Turbo"
-    return "meta-llama/Llama-3.2-3B-Instruct-Turbo"
+        return LARGE_MODEL
+    return SMALL_MODEL
 
 
-def need_location_data(messages):
-    # Basic analysis to determine which model to use
-    response = client.chat.completions.create(
-        model="meta-llama/Llama-3.2-3B-Instruct-Turbo",
+async def need_location_data(messages):
+    # Basic analysis to determine if the answer needs location data
+    response = await client.chat.completions.create(
+        model=SMALL_MODEL,
         messages=[
             *messages,
             {
@@ -63,9 +69,9 @@ def need_location_data(messages):
         return True
     return False
 
-def get_chat_response(messages, model):
+async def get_chat_response(messages, model):
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=model,
             messages=messages
         )
@@ -74,20 +80,78 @@ def get_chat_response(messages, model):
         print(f"Error getting response: {e}")
         return "Error: There are not enough tokens to complete it"
 
+# Coverage lookups get their own pool: asyncio.run() waits for the default
+# executor on exit, so a lookup started there would hold up every turn
+@st.cache_resource
+def get_lookup_executor():
+    return ThreadPoolExecutor(max_workers=4)
+
+async def run_chat_turn(messages, df, location):
+    # Start every call the turn might need at once: routing, location
+    # classification, a draft answer from the small model and the coverage
+    # lookup for the last known location. Requests that turn out not to be
+    # needed are cancelled. A lookup that is not needed keeps running on its
+    # pool, but the turn no longer waits for it, so the turn takes about as
+    # long as its slowest required call.
+    routing = asyncio.create_task(analyze_chat_history(messages))
+    classification = asyncio.create_task(need_location_data(messages))
+    draft = asyncio.create_task(get_chat_response(messages, SMALL_MODEL))
+    lookup = None
+    if location is not None:
+        lookup = asyncio.get_running_loop().run_in_executor(
+            get_lookup_executor(),
+            search_stations,
+            df,
+            location['lat'],
+            location['lon'],
+            location['radius'],
+            location['operator_filter']
+        )
+
+    tasks = [task for task in (routing, classification, draft, lookup) if task is not None]
+    try:
+        model_choice = await routing
+        print(f"Selected model: {model_choice}")
+        if model_choice != SMALL_MODEL:
+            draft.cancel()
+
+        needed = await classification
+        print(f"Need Location: {needed}")
+        location_message = None
+        lookup_error = None
+        if needed and lookup is not None:
+            # The lookup runs outside the script thread, so its errors are
+            # handed back and shown by main()
+            try:
+                data_location = await lookup
+            except Exception as e:
+                lookup_error = f"Error in search: {str(e)}"
+                data_location = None
+            if data_location:
+                location_message = {
+                    "role": "system",
+                    "content": f"Location data: \n {json.dumps(data_location, ensure_ascii=False)}"
+                }
+        elif lookup is not None:
+            lookup.cancel()
+
+        # The draft only answers the turn if it had everything it needed
+        if model_choice == SMALL_MODEL and location_message is None:
+            response_text = await draft
+        else:
+            draft.cancel()
+            final_messages = messages + [location_message] if location_message else messages
+            response_text = await get_chat_response(final_messages, model_choice)
+
+        return model_choice, location_message, lookup_error, response_text
+    finally:
+        for task in tasks:
+            task.cancel()
+
 def main():
     st.title("🌟 LlamaRural")
     st.subheader("🤖🦙 Optimus LLama Chatbot")
 
-    data_location = None
-
-    file_path = 'resources/nearby.json'
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            data_location = json.load(file)
-            # print("JSON loaded successfully:", data)
-    else:
-        print("File does not exist.")
-            
     # Display chat history
     for message in st.session_state.chat_messages:
         if message["role"] != 'system':
@@ -100,19 +164,22 @@ def main():
         st.session_state.chat_messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
-        
-        # Select appropriate model
-        model_choice = analyze_chat_history(st.session_state.chat_messages)  # Exclude the last message
-        print(f"Selected model: {model_choice}")
 
-        needed = need_location_data(st.session_state.chat_messages) 
-        print(f"Need Location: {needed}")
-        if needed and data_location is not None:
-            # Add assistant response to chat
-            st.session_state.chat_messages.append({"role": "system", "content": f"Location data: \n {data_location}"})
-
-        # Get response from the model
-        response_text = get_chat_response(st.session_state.chat_messages, model_choice)
+        # Coverage is looked up for the last location searched in this
+        # session, on the shared frame: search_stations() only reads it, so
+        # the turn does not copy the dataset before the pipeline starts.
+        location = st.session_state.get('last_location')
+        df = load_shared_data() if location is not None else None
+        if df is None:
+            location = None
+        
+        model_choice, location_message, lookup_error, response_text = asyncio.run(
+            run_chat_turn(list(st.session_state.chat_messages), df, location)
+        )
+        if lookup_error is not None:
+            st.error(lookup_error)
+        if location_message is not None:
+            st.session_state.chat_messages.append(location_message)
 
         # Add assistant response to chat
         st.session_state.chat_messages.append({"role": "assistant", "content": response_text})